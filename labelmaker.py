@@ -4,12 +4,25 @@ LabelMaker - A command-line utility for generating PDF labels for label printers
 This script generates PDF files formatted for Dymo and Brother P-touch label printers
 with customizable text and font sizes.
 """
+from __future__ import annotations
+
 import argparse
-from typing import Dict, List, Literal, Optional, Union
-from reportlab.lib.units import mm
-from reportlab.lib.pagesizes import landscape
-from reportlab.pdfgen import canvas
+import csv
+import math
+import zlib
+from functools import lru_cache
 from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Literal, Optional, Tuple, Union
+from reportlab.lib.units import mm
+from reportlab.lib.pagesizes import A4, landscape
+
+# The PDF machinery is imported where it is used, so --help and argument
+# errors exit without loading it
+if TYPE_CHECKING:
+    from reportlab.pdfgen import canvas
+    
+    # Either backend LabelMaker can draw labels with
+    PDFCanvas = Union[canvas.Canvas, 'TextPDFWriter']
 
 # Constants
 FONT_NAME = "Helvetica"
@@ -18,6 +31,221 @@ FONT_SIZES: Dict[str, int] = {'S': 8, 'M': 12, 'L': 18}
 # Label Types
 LabelType = Literal['dymo', 'ptouch']
 
+# Advance widths by ASCII code, in 1/1000ths of the font size, for the
+# standard PDF fonts the fast width path supports. Values are the Adobe AFM
+# metrics ReportLab ships; control characters are left at 0 because
+# string_width() only uses the table for printable text.
+ASCII_WIDTHS: Dict[str, Tuple[int, ...]] = {
+    'Helvetica': (
+        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 0,
+    ),
+}
+
+
+def is_plain_text(text: str) -> bool:
+    """
+    Check whether text is printable ASCII, the only text the ASCII_WIDTHS
+    table and TextPDFWriter handle. Anything else goes through ReportLab.
+    
+    Args:
+        text: Text to check
+        
+    Returns:
+        True if every character is printable ASCII
+    """
+    return text.isascii() and text.isprintable()
+
+
+@lru_cache(maxsize=4096)
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    """
+    Measure a string using the font's metrics, caching repeated lookups.
+    
+    Args:
+        text: Text to measure
+        font_name: Name of a registered font
+        font_size: Font size in points
+        
+    Returns:
+        Width of the text in points
+    """
+    if not text:
+        return 0.0
+    widths = ASCII_WIDTHS.get(font_name)
+    if widths is not None and is_plain_text(text):
+        # Same sum ReportLab computes, without loading its font registry
+        return sum(map(widths.__getitem__, text.encode('ascii'))) * 0.001 * font_size
+    from reportlab.pdfbase import pdfmetrics
+    return pdfmetrics.stringWidth(text, font_name, font_size)
+
+
+def format_pdf_number(value: float) -> str:
+    """
+    Format a number for a PDF file with the precision ReportLab uses: about
+    seven significant digits (at most six decimals), without trailing zeros.
+    
+    Args:
+        value: Number to format
+        
+    Returns:
+        Fixed-point representation of the number
+    """
+    magnitude = abs(value)
+    if magnitude <= 1e-7:
+        return '0'
+    decimals = 6 if magnitude <= 1 else min(max(0, 6 - int(math.log10(magnitude))), 6)
+    text = '%.*f' % (decimals, value)
+    return text.rstrip('0').rstrip('.') if decimals else text
+
+
+class TextPDFWriter:
+    """
+    Minimal PDF writer for pages of single-line Helvetica text.
+    
+    Implements the subset of the ReportLab canvas API that labels use, writing
+    the document directly instead of going through ReportLab's general-purpose
+    canvas. Only printable ASCII text is supported; see supports().
+    """
+    
+    # Fonts checked against ReportLab's output; other standard Type 1 fonts
+    # would work the same way but are left to ReportLab until tested
+    FONTS = frozenset({FONT_NAME})
+    
+    def __init__(self, output_file: Union[str, BinaryIO], compress: bool = False):
+        """
+        Initialize the writer.
+        
+        Args:
+            output_file: Path to save the PDF file, or a writable binary file-like object
+            compress: Whether to zlib-compress page content streams
+        """
+        self.output_file = output_file
+        self.compress = compress
+        self.page_size: Tuple[float, float] = A4
+        self.pages: List[Tuple[Tuple[float, float], bytes]] = []
+        self.fonts: List[str] = []
+        self._code: List[str] = []
+        self._font: Optional[Tuple[str, float]] = None
+    
+    @classmethod
+    def supports(cls, font_name: str, text: str) -> bool:
+        """
+        Check whether text in the given font can be written without ReportLab.
+        
+        Args:
+            font_name: Name of the font
+            text: Text content to draw
+            
+        Returns:
+            True if the font is in FONTS and the text is printable ASCII
+        """
+        return font_name in cls.FONTS and is_plain_text(text)
+    
+    def setPageSize(self, size: Tuple[float, float]) -> None:
+        """
+        Set the size of this and subsequent pages.
+        
+        Args:
+            size: Tuple of (width, height) in points
+        """
+        self.page_size = size
+    
+    def setFont(self, font_name: str, font_size: float) -> None:
+        """
+        Set the font for text drawn on the current page.
+        
+        Args:
+            font_name: Name of a font in FONTS
+            font_size: Font size in points
+        """
+        if font_name not in self.FONTS:
+            raise ValueError(f"Unsupported font for TextPDFWriter: {font_name}")
+        if font_name not in self.fonts:
+            self.fonts.append(font_name)
+        self._font = (font_name, font_size)
+    
+    def drawString(self, x: float, y: float, text: str) -> None:
+        """
+        Draw a line of text with its baseline starting at (x, y).
+        
+        Args:
+            x: Horizontal position in points
+            y: Vertical position in points
+            text: Printable ASCII text to draw
+        """
+        if self._font is None:
+            raise ValueError("setFont() must be called before drawString()")
+        if not is_plain_text(text):
+            raise ValueError(f"Unsupported text for TextPDFWriter: {text!r}")
+        font_name, font_size = self._font
+        escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        self._code.append(
+            f"BT /F{self.fonts.index(font_name) + 1} {format_pdf_number(font_size)} Tf "
+            f"{format_pdf_number(x)} {format_pdf_number(y)} Td ({escaped}) Tj ET"
+        )
+    
+    def showPage(self) -> None:
+        """Finish the current page and start a new one with the same page size."""
+        self.pages.append((self.page_size, '\n'.join(self._code).encode('ascii')))
+        self._code = []
+        self._font = None
+    
+    def save(self) -> None:
+        """Serialize the document and write it to the output file in a single call."""
+        if self._code or not self.pages:
+            self.showPage()
+        
+        # Objects: 1 catalog, 2 page tree, then fonts, then a page and its content per page
+        first_page = 3 + len(self.fonts)
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                ' '.join(f"{first_page + 2 * i} 0 R" for i in range(len(self.pages))),
+                len(self.pages),
+            )).encode('ascii'),
+        ]
+        for font_name in self.fonts:
+            objects.append(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{font_name} /Encoding /WinAnsiEncoding >>".encode('ascii')
+            )
+        font_resources = ' '.join(f"/F{i} {i + 2} 0 R" for i in range(1, len(self.fonts) + 1))
+        for i, ((width, height), content) in enumerate(self.pages):
+            objects.append((
+                f"<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {format_pdf_number(width)} {format_pdf_number(height)}] "
+                f"/Resources << /Font << {font_resources} >> >> /Contents {first_page + 2 * i + 1} 0 R >>"
+            ).encode('ascii'))
+            filters = ''
+            if self.compress:
+                content = zlib.compress(content)
+                filters = ' /Filter /FlateDecode'
+            objects.append(
+                b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(content), filters.encode('ascii'), content)
+            )
+        
+        data = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(data))
+            data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref_offset = len(data)
+        data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+        
+        if isinstance(self.output_file, str):
+            with open(self.output_file, 'wb') as pdf_file:
+                pdf_file.write(data)
+        else:
+            self.output_file.write(data)
+
 
 class Label:
     """Base class for all label types."""
@@ -33,12 +261,23 @@ class Label:
         self.text = text
         self.font_size = font_size
         
-    def generate(self, pdf: canvas.Canvas) -> None:
+    def page_size(self) -> Tuple[float, float]:
+        """
+        Calculate the page size needed for this label.
+        
+        Returns:
+            Tuple of (width, height) in points
+        """
+        raise NotImplementedError("Subclasses must implement page_size()")
+    
+    def generate(self, pdf: PDFCanvas, set_page_size: bool = True) -> None:
         """
         Generate the label on the provided canvas.
         
         Args:
-            pdf: ReportLab canvas object
+            pdf: ReportLab canvas or TextPDFWriter object
+            set_page_size: Set the page to page_size() first. Callers that
+                already know the current page has that size can pass False
         """
         raise NotImplementedError("Subclasses must implement generate()")
     
@@ -49,25 +288,29 @@ class Label:
         Returns:
             Width of the text in points
         """
-        test_pdf = BytesIO()
-        test_canvas = canvas.Canvas(test_pdf)
-        test_canvas.setFont(FONT_NAME, self.font_size)
-        return test_canvas.stringWidth(self.text, FONT_NAME, self.font_size)
+        return string_width(self.text, FONT_NAME, self.font_size)
     
     @staticmethod
-    def draw_text_centered(pdf: canvas.Canvas, text: str, width: float, height: float, font_size: int) -> None:
+    def draw_text_centered(pdf: PDFCanvas, text: str, width: float, height: float, font_size: int,
+                           text_width: Optional[float] = None) -> None:
         """
         Draw text centered on the current page.
         
         Args:
-            pdf: ReportLab canvas object
+            pdf: ReportLab canvas or TextPDFWriter object
             text: Text content to draw
             width: Width of the page
             height: Height of the page
             font_size: Font size for the text
+            text_width: Width of the text if already measured
         """
+        # Blank labels still produce their (empty) page, with nothing to draw
+        if not text or text.isspace():
+            pdf.showPage()
+            return
         pdf.setFont(FONT_NAME, font_size)
-        text_width = pdf.stringWidth(text, FONT_NAME, font_size)
+        if text_width is None:
+            text_width = string_width(text, FONT_NAME, font_size)
         x = (width - text_width) / 2
         y = (height - font_size) / 2
         pdf.drawString(x, y, text)
@@ -80,17 +323,29 @@ class DymoLabel(Label):
     # Fixed dimensions for Dymo labels
     WIDTH = 153
     HEIGHT = 72
+    PAGE_SIZE = landscape((WIDTH, HEIGHT))
+    
+    def page_size(self) -> Tuple[float, float]:
+        """
+        Return the fixed Dymo page size.
+        
+        Returns:
+            Tuple of (width, height) in points
+        """
+        return self.PAGE_SIZE
     
-    def generate(self, pdf: canvas.Canvas) -> None:
+    def generate(self, pdf: PDFCanvas, set_page_size: bool = True) -> None:
         """
         Generate a label specifically formatted for Dymo label printers.
         Uses fixed size labels (153x72).
         
         Args:
-            pdf: ReportLab canvas object
+            pdf: ReportLab canvas or TextPDFWriter object
+            set_page_size: Set the page to PAGE_SIZE first
         """
-        width, height = landscape((self.WIDTH, self.HEIGHT))
-        pdf.setPageSize((width, height))
+        if set_page_size:
+            pdf.setPageSize(self.PAGE_SIZE)
+        width, height = self.PAGE_SIZE
         self.draw_text_centered(pdf, self.text, width, height, self.font_size)
 
 
@@ -100,33 +355,66 @@ class PTouchLabel(Label):
     HEIGHT = 12 * mm
     PADDING = 10
     
-    def generate(self, pdf: canvas.Canvas) -> None:
+    def page_size(self) -> Tuple[float, float]:
+        """
+        Calculate the tape length needed for the text, plus padding.
+        
+        Returns:
+            Tuple of (width, height) in points
+        """
+        return (self.calculate_text_width() + self.PADDING, self.HEIGHT)
+    
+    def generate(self, pdf: PDFCanvas, set_page_size: bool = True) -> None:
         """
         Generate a label specifically formatted for Brother P-touch label printers.
         Width is dynamic based on text content (tape printer).
         
         Args:
-            pdf: ReportLab canvas object
+            pdf: ReportLab canvas or TextPDFWriter object
+            set_page_size: Set the page to page_size() first
         """
-        text_width = self.calculate_text_width() + self.PADDING
-        width = text_width
-        pdf.setPageSize((width, self.HEIGHT))
-        self.draw_text_centered(pdf, self.text, width, self.HEIGHT, self.font_size)
+        text_width = self.calculate_text_width()
+        width = text_width + self.PADDING
+        if set_page_size:
+            pdf.setPageSize((width, self.HEIGHT))
+        self.draw_text_centered(pdf, self.text, width, self.HEIGHT, self.font_size, text_width)
 
 
 class LabelMaker:
     """Main class for creating and managing label generation."""
     
-    def __init__(self, output_file: str = 'labels.pdf'):
+    def __init__(self, output_file: Union[str, BinaryIO] = 'labels.pdf', compress: bool = False,
+                 safe: bool = False):
         """
         Initialize LabelMaker with output file.
         
         Args:
-            output_file: Path to save the generated PDF file
+            output_file: Path to save the generated PDF file, or a writable
+                binary file-like object to stream it to
+            compress: Whether to zlib-compress page content streams. Label
+                pages are tiny, so this is off by default
+            safe: Always render with ReportLab instead of the built-in writer
         """
         self.output_file = output_file
-        self.pdf = canvas.Canvas(output_file)
+        self.compress = compress
+        self.safe = safe
         self.labels: List[Label] = []
+        self._pdf: Optional[canvas.Canvas] = None
+    
+    @property
+    def pdf(self) -> canvas.Canvas:
+        """
+        ReportLab canvas the labels will be drawn on, for callers that draw
+        extra content themselves. Accessing it makes generate_pdf() render
+        with ReportLab instead of the built-in writer.
+        
+        Returns:
+            ReportLab canvas object
+        """
+        if self._pdf is None:
+            from reportlab.pdfgen import canvas
+            self._pdf = canvas.Canvas(self.output_file, pageCompression=int(self.compress))
+        return self._pdf
     
     def add_label(self, label_type: LabelType, text: str, font_size: int, copies: int = 1) -> None:
         """
@@ -145,31 +433,121 @@ class LabelMaker:
                 label = PTouchLabel(text, font_size)
             self.labels.append(label)
     
+    def create_canvas(self) -> PDFCanvas:
+        """
+        Create the canvas to draw the labels on. Uses the built-in writer when it
+        can render every label, and the ReportLab canvas from pdf otherwise, when
+        safe is set, or when pdf has already been used.
+        
+        Returns:
+            TextPDFWriter or ReportLab canvas object
+        """
+        if (self._pdf is None and not self.safe
+                and all(TextPDFWriter.supports(FONT_NAME, label.text) for label in self.labels)):
+            return TextPDFWriter(self.output_file, compress=self.compress)
+        return self.pdf
+    
     def generate_pdf(self) -> None:
-        """Generate PDF file with all added labels."""
+        """
+        Generate PDF file with all added labels.
+        The document is serialized in memory and written in a single call.
+        """
+        pdf = self.create_canvas()
+        page_size = None
         for label in self.labels:
-            label.generate(self.pdf)
-        self.pdf.save()
-        print(f"PDF with {len(self.labels)} labels generated: {self.output_file}")
+            # The canvas keeps its page size across pages, so only resize on change
+            label_size = label.page_size()
+            label.generate(pdf, set_page_size=label_size != page_size)
+            page_size = label_size
+        pdf.save()
+
+
+def generate_label_bytes(label_type: LabelType, text: str, font_size: int, copies: int = 1) -> bytes:
+    """
+    Generate a label PDF in memory. Preferred for server use, e.g. returning
+    the PDF from a web view, since nothing is written to disk.
+    
+    Args:
+        label_type: Type of label ('dymo' or 'ptouch')
+        text: Text content for the label
+        font_size: Font size for the text
+        copies: Number of identical copies to create
+        
+    Returns:
+        The PDF document as bytes
+    """
+    buffer = BytesIO()
+    label_maker = LabelMaker(buffer)
+    label_maker.add_label(label_type, text, font_size, copies)
+    label_maker.generate_pdf()
+    return buffer.getvalue()
+
+
+def read_batch_file(path: str, default_size: str) -> List[Tuple[str, int]]:
+    """
+    Read labels from a UTF-8 CSV file with one text[,size] entry per row.
+    Whitespace around either column is ignored, and rows with no text are
+    skipped.
+    
+    Args:
+        path: Path to the CSV file
+        default_size: Size preset (S, M, L) for rows without a size column
+        
+    Returns:
+        List of (text, font_size) tuples in file order
+        
+    Raises:
+        ValueError: If default_size or a row's size is not a known preset, or
+            the file is not valid UTF-8
+    """
+    default_size = default_size.upper()
+    if default_size not in FONT_SIZES:
+        raise ValueError(f"unknown default size '{default_size}' (expected S, M or L)")
+    items = []
+    with open(path, newline='', encoding='utf-8-sig') as batch_file:
+        for line_number, row in enumerate(csv.reader(batch_file), start=1):
+            text = row[0].strip() if row else ''
+            if not text:
+                continue
+            size = (row[1].strip().upper() if len(row) > 1 else '') or default_size
+            if size not in FONT_SIZES:
+                raise ValueError(f"{path}:{line_number}: unknown size '{size}' (expected S, M or L)")
+            items.append((text, FONT_SIZES[size]))
+    return items
 
 
 def main() -> None:
     """Parse command-line arguments and generate label PDFs."""
     parser = argparse.ArgumentParser(description='Generate PDF labels for printers.')
     parser.add_argument('printer', choices=['dymo', 'ptouch'], help='Specify the printer type.')
-    parser.add_argument('labels', nargs='+', help='Labels to print.')
-    parser.add_argument('--size', choices=['S', 'M', 'L'], default='M', help='Font size: S, M, L.')
+    parser.add_argument('labels', nargs='*', help='Labels to print.')
+    parser.add_argument('--size', type=str.upper, choices=['S', 'M', 'L'], default='M', help='Font size: S, M, L.')
     parser.add_argument('--output', default='labels.pdf', help='Output PDF filename.')
     parser.add_argument('--copies', type=int, default=1, help='Number of copies for each label.')
+    parser.add_argument('--batch', help='CSV file of additional labels, one text[,size] per line.')
+    parser.add_argument('--compress', action='store_true', help='Compress page content (smaller file for large batches).')
+    parser.add_argument('--safe', action='store_true', help='Always render with ReportLab instead of the built-in writer.')
     args = parser.parse_args()
+    
+    batch_items: List[Tuple[str, int]] = []
+    if args.batch:
+        try:
+            batch_items = read_batch_file(args.batch, args.size)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if not args.labels and not batch_items:
+        parser.error('at least one label or a non-empty --batch file is required')
 
-    font_size = FONT_SIZES[args.size.upper()]
-    label_maker = LabelMaker(args.output)
+    font_size = FONT_SIZES[args.size]
+    label_maker = LabelMaker(args.output, compress=args.compress, safe=args.safe)
     
     for label_text in args.labels:
         label_maker.add_label(args.printer, label_text, font_size, args.copies)
+    for label_text, label_font_size in batch_items:
+        label_maker.add_label(args.printer, label_text, label_font_size, args.copies)
     
     label_maker.generate_pdf()
+    print(f"PDF with {len(label_maker.labels)} labels generated: {args.output}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+"""Tests for batch input, the CLI, in-memory generation and the built-in TextPDFWriter."""
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from labelmaker import (FONT_SIZES, LabelMaker, TextPDFWriter, format_pdf_number, generate_label_bytes, main,
+                        read_batch_file)
+
+pypdf = pytest.importorskip("pypdf")
+
+LABELS = ['Hello World', 'Kitchen (Drawer) 3', 'Back\\slash', 'x', '', '   ']
+
+
+def write_batch(tmp_path: Path, content: str, encoding: str = 'utf-8') -> str:
+    """Write a batch file under tmp_path and return its path."""
+    path = tmp_path / 'labels.csv'
+    path.write_text(content, encoding=encoding)
+    return str(path)
+
+
+def test_read_batch_file_sizes_and_whitespace(tmp_path: Path) -> None:
+    path = write_batch(tmp_path, 'Flour ,s\n  Sugar  \nRice, L \n')
+    assert read_batch_file(path, 'M') == [('Flour', 8), ('Sugar', 12), ('Rice', 18)]
+
+
+def test_read_batch_file_strips_bom(tmp_path: Path) -> None:
+    path = write_batch(tmp_path, 'Flour,S\nCafé\n', encoding='utf-8-sig')
+    assert read_batch_file(path, 'M') == [('Flour', 8), ('Café', 12)]
+
+
+def test_read_batch_file_skips_rows_without_text(tmp_path: Path) -> None:
+    path = write_batch(tmp_path, '\n   \n,\n ,L\nFlour\n')
+    assert read_batch_file(path, 'M') == [('Flour', 12)]
+
+
+def test_read_batch_file_rejects_unknown_size(tmp_path: Path) -> None:
+    path = write_batch(tmp_path, 'Flour\nSugar,XL\n')
+    with pytest.raises(ValueError, match=":2: unknown size 'XL'"):
+        read_batch_file(path, 'M')
+
+
+def test_read_batch_file_rejects_unknown_default_size(tmp_path: Path) -> None:
+    path = write_batch(tmp_path, 'Flour\n')
+    with pytest.raises(ValueError, match="unknown default size 'X'"):
+        read_batch_file(path, 'x')
+
+
+def test_main_rejects_unknown_batch_size(tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+                                         capsys: pytest.CaptureFixture) -> None:
+    path = write_batch(tmp_path, 'Flour,XL\n')
+    monkeypatch.setattr(sys, 'argv', ['labelmaker', 'dymo', '--batch', path])
+    with pytest.raises(SystemExit) as error:
+        main()
+    assert error.value.code == 2
+    assert "unknown size 'XL'" in capsys.readouterr().err
+
+
+def test_main_requires_labels(tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+                              capsys: pytest.CaptureFixture) -> None:
+    path = write_batch(tmp_path, '   \n')
+    for argv in (['labelmaker', 'dymo'], ['labelmaker', 'dymo', '--batch', path]):
+        monkeypatch.setattr(sys, 'argv', argv)
+        with pytest.raises(SystemExit) as error:
+            main()
+        assert error.value.code == 2
+        assert 'at least one label' in capsys.readouterr().err
+
+
+def render(printer: str, size: str, compress: bool, safe: bool) -> bytes:
+    """Render LABELS with the given options and return the PDF bytes."""
+    output = BytesIO()
+    label_maker = LabelMaker(output, compress=compress, safe=safe)
+    for text in LABELS:
+        label_maker.add_label(printer, text, FONT_SIZES[size], copies=2)
+    assert isinstance(label_maker.create_canvas(), TextPDFWriter) is not safe
+    label_maker.generate_pdf()
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('text', ['Hello World', 'Café'])
+def test_generate_label_bytes(text: str) -> None:
+    pdf = pypdf.PdfReader(BytesIO(generate_label_bytes('dymo', text, FONT_SIZES['M'], copies=3)), strict=True)
+    assert len(pdf.pages) == 3
+    for page in pdf.pages:
+        assert [float(value) for value in page.mediabox] == [0, 0, 153, 72]
+        assert page.extract_text().strip() == text
+
+
+@pytest.mark.parametrize('compress', [False, True])
+@pytest.mark.parametrize('size', ['S', 'M', 'L'])
+@pytest.mark.parametrize('printer', ['dymo', 'ptouch'])
+def test_writer_matches_reportlab(printer: str, size: str, compress: bool) -> None:
+    direct = pypdf.PdfReader(BytesIO(render(printer, size, compress, safe=False)), strict=True)
+    safe = pypdf.PdfReader(BytesIO(render(printer, size, compress, safe=True)), strict=True)
+
+    assert len(direct.pages) == len(safe.pages) == 2 * len(LABELS)
+    for direct_page, safe_page in zip(direct.pages, safe.pages):
+        assert list(direct_page.mediabox) == list(safe_page.mediabox)
+        assert direct_page.extract_text().strip() == safe_page.extract_text().strip()
+
+
+@pytest.mark.parametrize('value', [0, 1e-9, 0.5, 5, -3.25, 12 * 72 / 25.4, 153, 595.2756, 12345.678])
+def test_format_pdf_number_matches_reportlab(value: float) -> None:
+    from reportlab.lib.rl_accel import fp_str
+    assert float(format_pdf_number(value)) == float(fp_str(value))